@@ -1,7 +1,21 @@
 import usb
 
+from . import capture
+from . import compositor
 from . import constants
+from . import correction
+from . import effects
 from . import messages
+from . import loopcache
+from . import models
+from . import parallel
+from . import planner
+from . import profiling
+from . import rgb
+from . import sync
+from . import text
+from . import throughput
 
 from .constants import Matrix, Key, RgbEffect
+from .correction import ColorCorrection
 from .keyboard import *
@@ -0,0 +1,279 @@
+"""
+Decoding of USB captures (e.g. made with Wireshark) into messages.
+
+Both pcap and pcapng files are supported, with Linux usbmon
+and Windows USBPcap link types. Files are memory-mapped and read
+packet by packet, so captures of any size can be processed.
+"""
+
+import collections
+import mmap
+import struct
+
+from .messages import *
+
+
+LINKTYPE_USB_LINUX = 189
+"""Linux usbmon, with a 48-byte header."""
+
+LINKTYPE_USB_LINUX_MMAPPED = 220
+"""Linux usbmon, with a 64-byte header."""
+
+LINKTYPE_USBPCAP = 249
+"""Windows USBPcap."""
+
+ENDPOINT = 0x03
+"""The OUT endpoint used by `Keyboard` to send messages."""
+
+
+class CapturedPacket:
+    """A single raw packet of a capture."""
+
+    def __init__(self, timestamp: float, linktype: int, data: bytes):
+        self.timestamp = timestamp
+        self.linktype = linktype
+        self.data = data
+
+
+class CapturedMessage:
+    """A message decoded from a capture."""
+
+    def __init__(self, timestamp: float, message: Message):
+        self.timestamp = timestamp
+        self.message = message
+
+
+class CaptureSummary:
+    """Statistics collected while decoding a capture."""
+
+    def __init__(self):
+        self.packets = 0
+        self.payloads = 0
+        self.payload_bytes = 0
+        self.first_timestamp: float = None
+        self.last_timestamp: float = None
+        self.messages: collections.Counter[str] = collections.Counter()
+        self.unknown_opcodes: collections.Counter[bytes] = \
+            collections.Counter()
+        self.malformed: collections.Counter[bytes] = collections.Counter()
+
+    def get_duration(self) -> float:
+        if self.first_timestamp is None:
+            return 0.0
+
+        return self.last_timestamp - self.first_timestamp
+
+
+def _read_pcap(mm: mmap.mmap):
+    magic = mm[0:4]
+
+    if magic in (b'\xd4\xc3\xb2\xa1', b'\x4d\x3c\xb2\xa1'):
+        endian = '<'
+    elif magic in (b'\xa1\xb2\xc3\xd4', b'\xa1\xb2\x3c\x4d'):
+        endian = '>'
+    else:
+        raise ValueError('not a pcap file')
+
+    # nanosecond-resolution captures use a different magic
+    resolution = 1e-9 if magic in (b'\x4d\x3c\xb2\xa1', b'\xa1\xb2\x3c\x4d') \
+        else 1e-6
+
+    linktype, = struct.unpack_from(endian + 'I', mm, 20)
+    record = struct.Struct(endian + 'I I I I')
+
+    offset = 24
+    end = len(mm)
+
+    while offset + record.size <= end:
+        ts_sec, ts_frac, incl_len, _ = record.unpack_from(mm, offset)
+        offset += record.size
+
+        yield CapturedPacket(
+            timestamp=ts_sec + ts_frac * resolution,
+            linktype=linktype,
+            data=mm[offset:offset + incl_len],
+        )
+
+        offset += incl_len
+
+
+def _read_pcapng(mm: mmap.mmap):
+    interfaces: list[tuple[int, float]] = []
+    endian = '<'
+
+    offset = 0
+    end = len(mm)
+
+    while offset + 12 <= end:
+        block_type, = struct.unpack_from(endian + 'I', mm, offset)
+
+        if block_type == 0x0a0d0d0a:
+            # section header block, possibly changing the byte order
+            bom = mm[offset + 8:offset + 12]
+            endian = '<' if bom == b'\x4d\x3c\x2b\x1a' else '>'
+            interfaces = []
+
+        block_len, = struct.unpack_from(endian + 'I', mm, offset + 4)
+        body = offset + 8
+
+        if block_len < 12:
+            raise ValueError(f'malformed pcapng block at offset {offset}')
+
+        if block_type == 0x00000001:
+            linktype, = struct.unpack_from(endian + 'H', mm, body)
+            resolution = _read_tsresol(mm, endian, body + 8,
+                                       offset + block_len - 4)
+            interfaces.append((linktype, resolution))
+
+        elif block_type == 0x00000006:
+            interface, ts_high, ts_low, cap_len = \
+                struct.unpack_from(endian + 'I I I I', mm, body)
+            linktype, resolution = interfaces[interface]
+            data = body + 20
+
+            yield CapturedPacket(
+                timestamp=((ts_high << 32) | ts_low) * resolution,
+                linktype=linktype,
+                data=mm[data:data + cap_len],
+            )
+
+        elif block_type == 0x00000003:
+            linktype, _ = interfaces[0]
+            orig_len, = struct.unpack_from(endian + 'I', mm, body)
+            cap_len = min(orig_len, block_len - 16)
+            data = body + 4
+
+            yield CapturedPacket(
+                timestamp=0.0,
+                linktype=linktype,
+                data=mm[data:data + cap_len],
+            )
+
+        offset += block_len
+
+
+def _read_tsresol(mm: mmap.mmap, endian: str, offset: int, end: int) -> float:
+    while offset + 4 <= end:
+        code, length = struct.unpack_from(endian + 'H H', mm, offset)
+
+        if code == 0:
+            break
+
+        if code == 9:
+            value = mm[offset + 4]
+
+            if value & 0x80:
+                return 2.0 ** -(value & 0x7f)
+            else:
+                return 10.0 ** -value
+
+        offset += 4 + (length + 3) // 4 * 4
+
+    return 1e-6
+
+
+def read_capture(path: str):
+    """Iterate over all packets of a pcap or pcapng file."""
+
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[0:4] == b'\x0a\x0d\x0d\x0a':
+                yield from _read_pcapng(mm)
+            else:
+                yield from _read_pcap(mm)
+
+
+def get_payload(packet: CapturedPacket) -> bytes:
+    """
+    Extract the data sent to the keyboard's OUT endpoint.
+
+    Returns `None` for other packets, e.g. transfer completions,
+    interrupts from other endpoints, or unsupported link types.
+    """
+
+    data = packet.data
+
+    if packet.linktype in (LINKTYPE_USB_LINUX, LINKTYPE_USB_LINUX_MMAPPED):
+        if len(data) < 48:
+            return None
+
+        # usbmon headers are in the capturing host's byte order,
+        # which is little-endian in practice
+        event, endpoint = struct.unpack_from('< 8x c x B', data)
+
+        if event != b'S' or endpoint != ENDPOINT:
+            return None
+
+        header_len = 48 if packet.linktype == LINKTYPE_USB_LINUX else 64
+
+        return data[header_len:]
+
+    if packet.linktype == LINKTYPE_USBPCAP:
+        if len(data) < 27:
+            return None
+
+        header_len, = struct.unpack_from('< H', data)
+        info, endpoint = struct.unpack_from('< B 4x B', data, 16)
+
+        # bit 0 of info is set for transfers from the device
+        if info & 0x01 or endpoint != ENDPOINT:
+            return None
+
+        return data[header_len:]
+
+    return None
+
+
+def decode_capture(path: str, summary: CaptureSummary = None):
+    """
+    Iterate over all known messages sent to a keyboard in a capture.
+
+    If a `summary` is given, it is updated with every packet read.
+    Packets with a known opcode that fail to unpack, e.g. with values
+    out of the known ranges, are counted in `summary.malformed` and
+    skipped. Range checks are asserts, so under `python -O` such
+    packets are decoded as they are instead.
+    """
+
+    if summary is None:
+        summary = CaptureSummary()
+
+    for packet in read_capture(path):
+        summary.packets += 1
+
+        if summary.first_timestamp is None:
+            summary.first_timestamp = packet.timestamp
+        summary.last_timestamp = packet.timestamp
+
+        payload = get_payload(packet)
+
+        if not payload:
+            continue
+
+        summary.payloads += 1
+        summary.payload_bytes += len(payload)
+
+        message_type = get_message_type(payload)
+
+        if message_type is None:
+            summary.unknown_opcodes[payload[:4]] += 1
+            continue
+
+        try:
+            message = message_type.unpack(payload)
+        except (AssertionError, ValueError, struct.error):
+            summary.malformed[payload[:4]] += 1
+            continue
+
+        summary.messages[message_type.__name__] += 1
+
+        yield CapturedMessage(packet.timestamp, message)
+
+
+def summarize_capture(path: str) -> CaptureSummary:
+    """Decode a whole capture, only collecting the statistics."""
+
+    summary = CaptureSummary()
+    collections.deque(decode_capture(path, summary), maxlen=0)
+
+    return summary
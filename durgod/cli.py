@@ -0,0 +1,261 @@
+"""
+The `durgod` command-line tool.
+
+`durgod stream` keeps a single keyboard session open, and applies
+frames and commands read from stdin, either as newline-delimited JSON:
+
+    {"cmd": "frame", "colors": [16711680, 0, ...]}
+    {"cmd": "effect", "effect": "RAINBOW", "speed": 2, "brightness": 9}
+    {"cmd": "brightness", "value": 5}
+    {"cmd": "speed", "value": 3}
+    {"cmd": "on"}
+    {"cmd": "off"}
+
+or as raw frames of `FRAME_SIZE` bytes (R, G, B for every colormap entry).
+
+Frames are sent at most `--fps` times per second. When frames arrive
+faster than that, only the latest one is sent; commands are never dropped.
+"""
+
+import argparse
+import collections
+import json
+import sys
+import threading
+import time
+
+from . import profiling
+from .compositor import Compositor
+from .constants import *
+from .correction import ColorCorrection
+from .keyboard import Keyboard
+from .parallel import FRAME_SIZE
+from .rgb import RgbController
+
+
+_EOF = {'cmd': 'eof'}
+
+
+class FrameQueue:
+    """A queue of commands, where consecutive frames are coalesced."""
+
+    def __init__(self):
+        self.items: collections.deque[dict] = collections.deque()
+        self.condition = threading.Condition()
+
+    def put(self, item: dict):
+        with self.condition:
+            last = self.items[-1] if self.items else None
+
+            if item['cmd'] == 'frame' and last is not None \
+                    and last['cmd'] == 'frame':
+                self.items[-1] = item
+            else:
+                self.items.append(item)
+
+            self.condition.notify()
+
+    def get(self) -> dict:
+        with self.condition:
+            while not self.items:
+                self.condition.wait()
+
+            return self.items.popleft()
+
+
+def _check_frame(item: dict):
+    """
+    Raise `ValueError` unless `item` is a whole, valid frame.
+
+    Done before queuing, as queued frames replace each other,
+    so an invalid frame would drop the valid one before it.
+    """
+
+    colors = item.get('colors')
+
+    if not isinstance(colors, list) or len(colors) != FRAME_SIZE // 3:
+        raise ValueError(f'expected a list of {FRAME_SIZE // 3} colors')
+
+    # None leaves a key transparent, like in `Layer.set`
+    if not all(c is None or type(c) is int and 0 <= c <= 0xffffff
+               for c in colors):
+        raise ValueError('colors must be integers from 0 to 0xffffff')
+
+
+def _read_json(stream, queue: FrameQueue):
+    for line in stream:
+        line = line.strip()
+
+        if not line:
+            continue
+
+        try:
+            item = json.loads(line)
+        except ValueError as e:
+            print(f'durgod: skipping invalid line: {e}', file=sys.stderr)
+            continue
+
+        if not isinstance(item, dict) or 'cmd' not in item:
+            print('durgod: skipping line without "cmd"', file=sys.stderr)
+            continue
+
+        if item['cmd'] == 'frame':
+            try:
+                _check_frame(item)
+            except ValueError as e:
+                print(f'durgod: skipping invalid frame: {e}', file=sys.stderr)
+                continue
+
+        queue.put(item)
+
+
+def _read_raw(stream, queue: FrameQueue):
+    while True:
+        frame = stream.read(FRAME_SIZE)
+
+        if len(frame) < FRAME_SIZE:
+            break
+
+        colors = [
+            int.from_bytes(frame[i:i+3], 'big')
+            for i in range(0, FRAME_SIZE, 3)
+        ]
+        queue.put({'cmd': 'frame', 'colors': colors})
+
+
+def _read(reader, stream, queue: FrameQueue):
+    try:
+        reader(stream, queue)
+    finally:
+        queue.put(_EOF)
+
+
+def _apply(item: dict, controller: RgbController, compositor: Compositor):
+    cmd = item['cmd']
+
+    if cmd == 'frame':
+        # frames are checked by the readers, see `_check_frame`
+        layer = compositor.layers[0]
+        for i, color in enumerate(item['colors']):
+            layer.set(i, color)
+
+        compositor.apply(controller.keyboard)
+        controller.invalidate()
+        return
+
+    # any of these replace the colormap on the keyboard
+    compositor.invalidate()
+
+    if cmd == 'effect':
+        args = dict(item)
+        del args['cmd']
+        args['effect'] = RgbEffect[args.get('effect', 'PLAY')]
+
+        controller.apply_rgb_effect(**args)
+    elif cmd == 'brightness':
+        controller.set_brightness(item['value'])
+    elif cmd == 'speed':
+        controller.set_speed(item['value'])
+    elif cmd == 'on':
+        controller.enable()
+    elif cmd == 'off':
+        controller.disable()
+    else:
+        raise ValueError(f'unknown command: {cmd}')
+
+
+def stream(keyboard: Keyboard, input, raw: bool = False, fps: float = 60):
+    """Apply frames and commands from `input` until it ends."""
+
+    queue = FrameQueue()
+    reader = _read_raw if raw else _read_json
+
+    thread = threading.Thread(
+        target=_read, args=(reader, input, queue), daemon=True)
+    thread.start()
+
+    controller = RgbController(keyboard)
+    compositor = Compositor()
+    compositor.add_layer()
+
+    interval = 1 / fps
+    next_frame = time.monotonic()
+
+    while True:
+        item = queue.get()
+
+        if item is _EOF:
+            break
+
+        if item['cmd'] == 'frame':
+            delay = next_frame - time.monotonic()
+
+            # more frames may arrive while waiting, so take the latest one
+            if delay > 0:
+                time.sleep(delay)
+                item = _take_latest(queue, item)
+
+            next_frame = max(next_frame + interval, time.monotonic())
+
+        try:
+            _apply(item, controller, compositor)
+        except (LookupError, ValueError, TypeError, AssertionError) as e:
+            print(f'durgod: skipping invalid command: {e!r}', file=sys.stderr)
+
+
+def _take_latest(queue: FrameQueue, item: dict) -> dict:
+    with queue.condition:
+        if queue.items and queue.items[0]['cmd'] == 'frame':
+            return queue.items.popleft()
+
+    return item
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(
+        prog='durgod',
+        description='Control Durgod Taurus keyboards.',
+    )
+    parser.add_argument(
+        '--profile', metavar='PATH',
+        help='record per-stage timings, and write them to PATH at exit',
+    )
+    parser.add_argument(
+        '--product-id', type=lambda s: int(s, 16),
+        help='USB product id of the keyboard, in hex (default: any)',
+    )
+
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    stream_parser = commands.add_parser(
+        'stream', help='apply frames and commands from stdin')
+    stream_parser.add_argument(
+        '--raw', action='store_true',
+        help=f'read raw {FRAME_SIZE}-byte RGB frames instead of JSON lines',
+    )
+    stream_parser.add_argument(
+        '--fps', type=float, default=60,
+        help='maximum frames sent per second (default: %(default)s)',
+    )
+    stream_parser.add_argument(
+        '--gamma', type=float,
+        help='apply gamma correction to frames',
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.profile is not None:
+        profiling.enable(args.profile, trace_allocations=True)
+
+    keyboard = Keyboard.find(args.product_id)
+
+    if keyboard is None:
+        parser.exit(1, 'durgod: keyboard not found\n')
+
+    if args.command == 'stream':
+        if args.gamma is not None:
+            keyboard.correction = ColorCorrection.for_keyboard(
+                keyboard.device.idProduct, gamma=args.gamma)
+
+        input = sys.stdin.buffer if args.raw else sys.stdin
+        stream(keyboard, input, raw=args.raw, fps=args.fps)
@@ -0,0 +1,206 @@
+import bisect
+import enum
+import time
+
+from .keyboard import Keyboard, Colormap
+
+
+class BlendMode(enum.Enum):
+    """How a layer's colors are combined with the layers below it."""
+
+    NORMAL = enum.auto()
+    ADD = enum.auto()
+    MULTIPLY = enum.auto()
+    SCREEN = enum.auto()
+
+
+def _blend_channel(mode: BlendMode, below: int, above: int) -> int:
+    if mode == BlendMode.NORMAL:
+        return above
+    if mode == BlendMode.ADD:
+        return min(below + above, 0xff)
+    if mode == BlendMode.MULTIPLY:
+        return below * above // 0xff
+    if mode == BlendMode.SCREEN:
+        return 0xff - (0xff - below) * (0xff - above) // 0xff
+
+    raise ValueError(f'unknown blend mode: {mode}')
+
+
+def blend(mode: BlendMode, alpha: float, below: int, above: int) -> int:
+    """Blend two 0xRRGGBB colors."""
+
+    result = 0
+
+    for shift in (16, 8, 0):
+        b = (below >> shift) & 0xff
+        a = _blend_channel(mode, b, (above >> shift) & 0xff)
+        result |= round(b + (a - b) * alpha) << shift
+
+    return result
+
+
+class Layer:
+    """
+    A single layer of a `Compositor`.
+
+    Cells set to `None` are transparent.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        z: int,
+        alpha: float,
+        blend: BlendMode,
+        expires: float,
+    ):
+        self.colors: list[int] = [None] * size
+        self.z = z
+        self.alpha = alpha
+        self.blend = blend
+        self.expires = expires
+        self.dirty: set[int] = set()
+
+    def set(self, index: int, color: int):
+        assert color is None or color & 0xffffff == color
+
+        if self.colors[index] != color:
+            self.colors[index] = color
+            self.dirty.add(index)
+
+    def fill(self, color: int):
+        for i in range(len(self.colors)):
+            self.set(i, color)
+
+    def clear(self):
+        self.fill(None)
+
+    def set_alpha(self, alpha: float):
+        assert 0 <= alpha <= 1
+
+        self.alpha = alpha
+        self._touch()
+
+    def set_blend(self, blend: BlendMode):
+        self.blend = blend
+        self._touch()
+
+    def _get_cells(self) -> list[int]:
+        return [i for i, c in enumerate(self.colors) if c is not None]
+
+    def _touch(self):
+        self.dirty.update(self._get_cells())
+
+
+class Compositor:
+    """
+    Combines z-ordered layers into a single colormap.
+
+    Only the cells changed since the last composition are recomputed,
+    and only the rows containing them are sent to the keyboard.
+    """
+
+    def __init__(self, background: int = 0x000000):
+        self.size = Colormap.ROW_LENGTH * Colormap.ROW_COUNT
+        self.background = background
+
+        self.layers: list[Layer] = []
+        self.colormap = Colormap([background] * self.size)
+
+        self._dirty: set[int] = set()
+        self._sent = False
+
+    def add_layer(
+        self,
+        z: int = 0,
+        alpha: float = 1.0,
+        blend: BlendMode = BlendMode.NORMAL,
+        ttl: float = None,
+    ) -> Layer:
+        """
+        Add a layer above all the layers with the same or lower `z`.
+
+        If `ttl` is given, the layer is removed after that many seconds.
+        """
+
+        assert 0 <= alpha <= 1
+
+        expires = None if ttl is None else time.monotonic() + ttl
+        layer = Layer(self.size, z, alpha, blend, expires)
+
+        index = bisect.bisect_right([other.z for other in self.layers], z)
+        self.layers.insert(index, layer)
+
+        return layer
+
+    def remove_layer(self, layer: Layer):
+        self.layers.remove(layer)
+
+        self._dirty.update(layer.dirty)
+        self._dirty.update(layer._get_cells())
+
+    def _compose_cell(self, index: int) -> int:
+        color = self.background
+
+        for layer in self.layers:
+            above = layer.colors[index]
+
+            if above is not None:
+                color = blend(layer.blend, layer.alpha, color, above)
+
+        return color
+
+    def compose(self, now: float = None) -> set[int]:
+        """
+        Recompute the changed cells, dropping expired layers.
+
+        Returns the indices of the colormap rows that have changed.
+        """
+
+        if now is None:
+            now = time.monotonic()
+
+        for layer in list(self.layers):
+            if layer.expires is not None and layer.expires <= now:
+                self.remove_layer(layer)
+
+        for layer in self.layers:
+            self._dirty.update(layer.dirty)
+            layer.dirty.clear()
+
+        rows: set[int] = set()
+        colors = self.colormap.colors
+
+        for index in self._dirty:
+            color = self._compose_cell(index)
+
+            if colors[index] != color:
+                colors[index] = color
+                rows.add(index // Colormap.ROW_LENGTH)
+
+        self._dirty.clear()
+
+        return rows
+
+    def invalidate(self):
+        """Send the whole colormap next time, e.g. after an RGB effect."""
+
+        self._sent = False
+
+    def apply(self, keyboard: Keyboard, now: float = None) -> set[int]:
+        """
+        Compose and send the changed rows to the keyboard.
+
+        The whole colormap is sent the first time.
+        """
+
+        rows = self.compose(now)
+
+        if not self._sent:
+            keyboard.apply_colormap(self.colormap)
+            self._sent = True
+        elif rows:
+            keyboard.apply_colormap(self.colormap, sorted(rows))
+
+        return rows
@@ -0,0 +1,70 @@
+from . import profiling
+from .constants import *
+from .models import get_model
+
+
+class ColorCorrection:
+    """
+    Per-channel color correction applied to colormaps before sending.
+
+    Gamma, brightness and white balance are folded into three
+    precomputed 256-entry lookup tables, so correcting a row of packed
+    colors is just a `bytes.translate` per channel.
+    """
+
+    def __init__(
+        self,
+        gamma: float = 2.2,
+        brightness: float = 1.0,
+        white_balance: tuple[float, float, float] = (1.0, 1.0, 1.0),
+    ):
+        assert gamma > 0
+        assert 0 <= brightness <= 1
+        assert len(white_balance) == 3
+        assert all(0 <= scale <= 1 for scale in white_balance)
+
+        self.gamma = gamma
+        self.brightness = brightness
+        self.white_balance = white_balance
+
+        self.tables = tuple(
+            ColorCorrection._make_table(gamma, brightness * scale)
+            for scale in white_balance
+        )
+
+    def for_keyboard(
+        product_id: KeyboardId,
+        gamma: float = 2.2,
+        brightness: float = 1.0,
+    ) -> 'ColorCorrection':
+        """A correction with the white balance of the keyboard's model."""
+
+        white_balance = get_model(product_id).white_balance
+
+        return ColorCorrection(gamma, brightness, white_balance)
+
+    def _make_table(gamma: float, scale: float) -> bytes:
+        return bytes(
+            round(255 * scale * (i / 255) ** gamma)
+            for i in range(256)
+        )
+
+    def apply(self, entries: bytes) -> bytes:
+        """Correct a sequence of big-endian 3-byte RGB entries."""
+
+        assert len(entries) % 3 == 0
+
+        red, green, blue = self.tables
+
+        with profiling.stage('correct'):
+            result = bytearray(len(entries))
+            result[0::3] = entries[0::3].translate(red)
+            result[1::3] = entries[1::3].translate(green)
+            result[2::3] = entries[2::3].translate(blue)
+
+            return bytes(result)
+
+    def apply_color(self, color: int) -> int:
+        """Correct a single 0xRRGGBB color."""
+
+        return int.from_bytes(self.apply(color.to_bytes(3, 'big')), 'big')
@@ -0,0 +1,221 @@
+"""
+Host-rendered lighting effects.
+
+Unlike `RgbEffect`, these are computed on the host
+and sent to the keyboard frame by frame as colormaps.
+"""
+
+import abc
+import colorsys
+import math
+
+from . import profiling
+from .keyboard import Colormap, Layout
+
+
+def scale_color(color: int, factor: float) -> int:
+    """Scale all channels of a 0xRRGGBB color by `factor` in [0, 1]."""
+
+    r = round(((color >> 16) & 0xff) * factor)
+    g = round(((color >> 8) & 0xff) * factor)
+    b = round((color & 0xff) * factor)
+
+    return r << 16 | g << 8 | b
+
+
+def mix_colors(color1: int, color2: int, factor: float) -> int:
+    """Blend two 0xRRGGBB colors, with `factor` in [0, 1] of `color1`."""
+
+    result = 0
+
+    for shift in (16, 8, 0):
+        c1 = (color1 >> shift) & 0xff
+        c2 = (color2 >> shift) & 0xff
+        result |= round(c1 * factor + c2 * (1 - factor)) << shift
+
+    return result
+
+
+def _get_xs(layout: Layout) -> tuple[float, ...]:
+    return tuple(x / layout.width for (x, _) in layout.get_centers())
+
+
+def _get_hue(hue: float, value: float) -> int:
+    r, g, b = colorsys.hsv_to_rgb(hue % 1.0, 1.0, value)
+
+    return round(r * 255) << 16 | round(g * 255) << 8 | round(b * 255)
+
+
+class PeriodicEffect(abc.ABC):
+    """
+    An effect that repeats itself every `period` frames.
+
+    Rendering must be deterministic: the same effect parameters
+    and frame index always give the same colors.
+    """
+
+    def __init__(self, period: int):
+        assert period > 0
+
+        self.period = period
+
+    @abc.abstractmethod
+    def get_key(self) -> tuple:
+        """A hashable value identifying the effect and its parameters."""
+
+        pass
+
+    @abc.abstractmethod
+    def render(self, index: int) -> list[int]:
+        """Render colors of the frame `index`, modulo `period`."""
+
+        pass
+
+    def render_colormap(self, index: int) -> Colormap:
+        with profiling.stage('render'):
+            colors = self.render(index)
+
+            assert all(c & 0xffffff == c for c in colors), \
+                f'{type(self).__name__} rendered a color out of range'
+
+            return Colormap(colors)
+
+
+class Static(PeriodicEffect):
+    """All keys lit with a single color."""
+
+    def __init__(self, color: int = 0xffffff):
+        super().__init__(1)
+
+        self.color = color
+
+    def get_key(self) -> tuple:
+        return ('static', self.color)
+
+    def render(self, index: int) -> list[int]:
+        return [self.color] * (Colormap.ROW_LENGTH * Colormap.ROW_COUNT)
+
+
+class Breathing(PeriodicEffect):
+    """All keys fade in and out with a single color."""
+
+    def __init__(self, color: int = 0xffffff, period: int = 120):
+        super().__init__(period)
+
+        self.color = color
+
+    def get_key(self) -> tuple:
+        return ('breathing', self.color, self.period)
+
+    def render(self, index: int) -> list[int]:
+        t = (index % self.period) / self.period
+        level = (1 - math.cos(2 * math.pi * t)) / 2
+
+        color = scale_color(self.color, level)
+
+        return [color] * (Colormap.ROW_LENGTH * Colormap.ROW_COUNT)
+
+
+class Rainbow(PeriodicEffect):
+    """A rainbow moving horizontally across the keyboard."""
+
+    def __init__(
+        self,
+        layout: Layout,
+        period: int = 120,
+        brightness: float = 1.0,
+        reversed: bool = False,
+    ):
+        super().__init__(period)
+
+        self.xs = _get_xs(layout)
+        self.brightness = brightness
+        self.reversed = reversed
+
+    def get_key(self) -> tuple:
+        return ('rainbow', self.xs, self.period, self.brightness,
+                self.reversed)
+
+    def render(self, index: int) -> list[int]:
+        t = (index % self.period) / self.period
+        if self.reversed:
+            t = -t
+
+        return [_get_hue(x + t, self.brightness) for x in self.xs]
+
+
+class Wave(PeriodicEffect):
+    """
+    A wave moving horizontally across the keyboard.
+
+    The wave has a single `color`, or without one the colors of a
+    rainbow spread across the keyboard, like the firmware's `WAVES`.
+    """
+
+    def __init__(
+        self,
+        layout: Layout,
+        color: int = 0xffffff,
+        period: int = 120,
+        reversed: bool = False,
+        brightness: float = 1.0,
+    ):
+        super().__init__(period)
+
+        self.xs = _get_xs(layout)
+        self.color = color
+        self.reversed = reversed
+        self.brightness = brightness
+
+        if color is None:
+            self.colors = tuple(_get_hue(x, brightness) for x in self.xs)
+        else:
+            self.colors = (scale_color(color, brightness),) * len(self.xs)
+
+    def get_key(self) -> tuple:
+        return ('wave', self.xs, self.color, self.period, self.reversed,
+                self.brightness)
+
+    def render(self, index: int) -> list[int]:
+        t = (index % self.period) / self.period
+        if self.reversed:
+            t = -t
+
+        return [
+            scale_color(color, (1 + math.sin(2 * math.pi * (x - t))) / 2)
+            for x, color in zip(self.xs, self.colors)
+        ]
+
+
+class TwoColors(PeriodicEffect):
+    """Two colors fading into each other, moving across the keyboard."""
+
+    def __init__(
+        self,
+        layout: Layout,
+        color1: int = 0xffffff,
+        color2: int = 0xffffff,
+        period: int = 120,
+        reversed: bool = False,
+    ):
+        super().__init__(period)
+
+        self.xs = _get_xs(layout)
+        self.color1 = color1
+        self.color2 = color2
+        self.reversed = reversed
+
+    def get_key(self) -> tuple:
+        return ('two_colors', self.xs, self.color1, self.color2,
+                self.period, self.reversed)
+
+    def render(self, index: int) -> list[int]:
+        t = (index % self.period) / self.period
+        if self.reversed:
+            t = -t
+
+        return [
+            mix_colors(self.color1, self.color2,
+                       (1 + math.sin(2 * math.pi * (x - t))) / 2)
+            for x in self.xs
+        ]
@@ -1,8 +1,13 @@
+import array
+import sys
 import time
 import usb
 
+from . import profiling
 from .constants import *
+from .correction import *
 from .messages import *
+from .models import Model, get_model
 
 
 class Keymap:
@@ -10,13 +15,22 @@ class Keymap:
     Represents a mapping for a "custom layer" of a keyboard.
 
     On a Durgod Taurus K320 Nebula, it is toggled by Fn+F12.
+
+    Keys are stored as a compact `array('I')` of keycodes,
+    so reading `keys` gives plain ints rather than `Key` values.
     """
 
     ROW_LENGTH = 8
     ROW_COUNT = 16
 
+    __slots__ = ('keys',)
+
     def __init__(self, keys: list[Key]):
-        self.keys = keys
+        # validates all keycodes at once: array() raises on
+        # anything that is not an unsigned 32-bit int
+        self.keys = array.array('I', keys)
+
+        assert len(self.keys) == Keymap.ROW_LENGTH * Keymap.ROW_COUNT
 
     def get_row(self, index: int) -> list[Key]:
         assert 0 <= index < Keymap.ROW_COUNT
@@ -24,7 +38,45 @@ class Keymap:
         start = index * Keymap.ROW_LENGTH
         end = (index + 1) * Keymap.ROW_LENGTH
 
-        return self.keys[start:end]
+        return [Key(k) for k in self.keys[start:end]]
+
+    def get_row_bytes(self, index: int) -> memoryview:
+        """The little-endian keycodes of a row, as sent to the keyboard."""
+
+        assert 0 <= index < Keymap.ROW_COUNT
+
+        keys = self.keys
+        if sys.byteorder != 'little':
+            keys = array.array('I', keys)
+            keys.byteswap()
+
+        size = Keymap.ROW_LENGTH * keys.itemsize
+        return memoryview(keys).cast('B')[index * size:(index + 1) * size]
+
+    def copy(self) -> 'Keymap':
+        return Keymap(self.keys)
+
+    def diff(self, other: 'Keymap') -> list[int]:
+        """Matrix positions where the two keymaps differ."""
+
+        if self.keys == other.keys:
+            return []
+
+        return [
+            i for i, (a, b) in enumerate(zip(self.keys, other.keys))
+            if a != b
+        ]
+
+    def get_changed_rows(self, other: 'Keymap') -> list[int]:
+        return sorted({i // Keymap.ROW_LENGTH for i in self.diff(other)})
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Keymap):
+            return NotImplemented
+
+        return self.keys == other.keys
+
+    __hash__ = None
 
 
 class Colormap:
@@ -130,8 +182,17 @@ class Keyboard:
 
         return Keyboard(device)
 
-    def __init__(self, device: usb.Device):
+    def __init__(
+        self,
+        device: usb.Device,
+        correction: ColorCorrection = None,
+    ):
         self.device = device
+        self.model: Model = get_model(device.idProduct)
+
+        # colors are sent as-is unless a correction is set,
+        # e.g. `ColorCorrection.for_keyboard(device.idProduct)`
+        self.correction = correction
 
         config = device.get_active_configuration()
 
@@ -139,49 +200,29 @@ class Keyboard:
         if self.device.is_kernel_driver_active(interface.index):
             self.device.detach_kernel_driver(interface.index)
 
+    def _pack(self, msg: Message, pad_to_length: int = 64) -> bytes:
+        with profiling.stage('encode'):
+            msg_bytes = msg.pack()
+            return msg_bytes + bytes(pad_to_length - len(msg_bytes))
+
     def _write(self, msg: Message, pad_to_length: int = 64):
-        msg_bytes = msg.pack()
-        msg_bytes += bytes(pad_to_length - len(msg_bytes))
-        self.device.write(0x03, msg_bytes)
+        self._write_packed(self._pack(msg, pad_to_length))
+
+    def _write_packed(self, msg_bytes: bytes):
+        with profiling.stage('write'):
+            self.device.write(0x03, msg_bytes)
 
     def get_default_keymap(self) -> Keymap:
         # this is an instance method, because it possibly depends
         # on exact keyboard model
 
-        # TODO: models with a numpad
-        return Keymap([  # noqa
-            Key.ESC,    Key.NONE,   Key.F1,     Key.F2,     Key.F3,     Key.F4,     Key.F5,
-            Key.F6,     Key.F7,     Key.F8,     Key.F9,     Key.F10,    Key.F11,    Key.F12,
-            Key.PSCR,   Key.SLCK,   Key.PAUSE,  Key.NONE,   Key.NONE,   Key.NONE,   Key.NONE,
-
-            Key.GRAVE,  Key._1,     Key._2,     Key._3,     Key._4,     Key._5,     Key._6,
-            Key._7,     Key._8,     Key._9,     Key._0,     Key.MINUS,  Key.EQUAL,  Key.BSPACE,
-            Key.INSERT, Key.HOME,   Key.PGUP,   Key.NONE,   Key.NONE,   Key.NONE,   Key.NONE,
-
-            Key.TAB,    Key.Q,      Key.W,      Key.E,      Key.R,      Key.T,      Key.Y,
-            Key.U,      Key.I,      Key.O,      Key.P,      Key.LBRC,   Key.RBRC,   Key.BSLASH,
-            Key.DELETE, Key.END,    Key.PGDOWN, Key.NONE,   Key.NONE,   Key.NONE,   Key.NONE,
-
-            Key.CAPS,   Key.A,      Key.S,      Key.D,      Key.F,      Key.G,      Key.H,
-            Key.J,      Key.K,      Key.L,      Key.SCOLON, Key.QUOTE,  Key.NONE,   Key.ENTER,
-            Key.NONE,   Key.NONE,   Key.NONE,   Key.NONE,   Key.NONE,   Key.NONE,   Key.NONE,
-
-            Key.LSHIFT, Key.NONE,   Key.Z,      Key.X,      Key.C,      Key.V,      Key.B,
-            Key.N,      Key.M,      Key.COMMA,  Key.DOT,    Key.SLASH,  Key.NONE,   Key.RSHIFT,
-            Key.NONE,   Key.UP,     Key.NONE,   Key.NONE,   Key.NONE,   Key.NONE,   Key.NONE,
-
-            Key.LCTRL,  Key.LGUI,   Key.LALT,   Key.NONE,   Key.NONE,   Key.NONE,   Key.SPACE,
-            Key.NONE,   Key.NONE,   Key.NONE,   Key.RALT,   Key.FN,     Key.APP,    Key.RCTRL,
-            Key.LEFT,   Key.DOWN,   Key.RIGHT,  Key.NONE,   Key.NONE,   Key.NONE,   Key.NONE,
-
-            Key.WINLOCK_WIN, Key.MAGIC_PADDING,
-        ])
+        return Keymap(self.model.get_keymap_entries())
 
     def apply_keymap(self, keymap: Keymap):
         self._write(KeymapStartMessage())
 
         for i in range(Keymap.ROW_COUNT):
-            self._write(KeymapRowMessage(i, keymap.get_row(i)))
+            self._write(KeymapRowMessage(i, keymap.get_row_bytes(i)))
 
         self._write(KeymapEndMessage())
 
@@ -191,6 +232,12 @@ class Keyboard:
     def disable_rgb(self):
         self._write(RgbStateMessage(RgbState.OFF))
 
+    def set_rgb_brightness(self, brightness: int):
+        self._write(RgbBrightnessMessage(brightness))
+
+    def set_rgb_speed(self, speed: int):
+        self._write(RgbSpeedMessage(speed))
+
     def apply_rgb_effect(
         self,
         effect: RgbEffect = RgbEffect.PLAY,
@@ -219,44 +266,33 @@ class Keyboard:
 
         return Colormap([0x000000] * Colormap.ROW_LENGTH * Colormap.ROW_COUNT)
 
-    def apply_colormap(self, colormap: Colormap):
-        self._write(RgbStateMessage(RgbState.OFF))
-        self._write(RgbColormapStartMessage())
-
-        for i in range(Colormap.ROW_COUNT):
-            self._write(RgbColormapRowMessage(i, colormap.get_row(i)))
-
-        self._write(RgbColormapEndMessage())
-
-    def get_layout(self) -> Layout:
-        # this is an instance method, because it possibly depends
-        # on exact keyboard model
+    def _colormap_messages(
+        self,
+        colormap: Colormap,
+        rows: list[int] = None,
+    ) -> list[Message]:
+        if rows is None:
+            rows = range(Colormap.ROW_COUNT)
 
-        G = Layout.Group
+        messages = [RgbStateMessage(RgbState.OFF), RgbColormapStartMessage()]
 
-        # TODO: models with a numpad
-        return Layout(width=18.25, height=6.5, groups=[
-            G(1), G(skip=1, x=1), G(4), G(x=0.5), G(4), G(x=0.5), G(4),
-            G(x=0.25), G(3),
-            G(skip=4),
+        for i in rows:
+            messages.append(RgbColormapRowMessage(
+                i, colormap.get_row(i), self.correction))
 
-            G(row=True, y=0.5), G(13), G(1, w=2),
-            G(x=0.25), G(3),
-            G(skip=4),
+        messages.append(RgbColormapEndMessage())
 
-            G(row=True), G(1, w=1.5), G(12), G(1, w=1.5),
-            G(x=0.25), G(3),
-            G(skip=4),
+        return messages
 
-            G(row=True), G(1, w=1.75), G(11), G(skip=1), G(1, w=2.25),
-            G(skip=3),
-            G(skip=4),
+    def apply_colormap(self, colormap: Colormap, rows: list[int] = None):
+        # when only some `rows` are sent, the rest
+        # keep the colors from the previous colormap
+        with profiling.frame():
+            for msg in self._colormap_messages(colormap, rows):
+                self._write(msg)
 
-            G(row=True), G(1, w=2.25), G(skip=1), G(10), G(skip=1), G(1, w=2.75),  # noqa
-            G(skip=1, x=1.25), G(1), G(skip=1),
-            G(skip=4),
+    def get_layout(self) -> Layout:
+        # this is an instance method, because it possibly depends
+        # on exact keyboard model
 
-            G(row=True), G(3, w=1.25), G(skip=3), G(1, w=6.25), G(skip=3), G(4, w=1.25),  # noqa
-            G(x=0.25), G(3),
-            G(skip=4)
-        ])
+        return self.model.get_layout()
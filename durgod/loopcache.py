@@ -0,0 +1,117 @@
+import collections
+import sys
+import time
+
+from . import profiling
+from .effects import PeriodicEffect
+from .keyboard import Keyboard
+
+
+class LoopCache:
+    """
+    Caches one rendered period of periodic effects, to replay it
+    instead of rendering every frame again.
+
+    Loops can be cached either as colors, or pre-encoded into
+    the packets sent to a keyboard. The least recently used loops
+    are evicted when the total size exceeds `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries: collections.OrderedDict[tuple, tuple[tuple, int]] = \
+            collections.OrderedDict()
+
+    def _get(self, key: tuple) -> tuple:
+        entry = self.entries.get(key)
+
+        if entry is None:
+            return None
+
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def _put(self, key: tuple, value: tuple, size: int):
+        if size > self.max_bytes:
+            return
+
+        self.entries[key] = (value, size)
+        self.size += size
+
+        while self.size > self.max_bytes:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.size -= evicted_size
+
+    def get_frames(self, effect: PeriodicEffect) -> tuple[tuple[int, ...]]:
+        """Colors of every frame of the effect's period."""
+
+        key = ('frames', effect.get_key())
+        frames = self._get(key)
+
+        if frames is None:
+            frames = tuple(
+                tuple(effect.render(i)) for i in range(effect.period)
+            )
+
+            size = sum(
+                sys.getsizeof(f) + sum(sys.getsizeof(c) for c in f)
+                for f in frames
+            )
+            self._put(key, frames, size)
+
+        return frames
+
+    def get_packets(
+        self,
+        keyboard: Keyboard,
+        effect: PeriodicEffect,
+    ) -> tuple[tuple[bytes, ...]]:
+        """Encoded colormap packets of every frame of the effect's period."""
+
+        correction = keyboard.correction
+        correction_key = None if correction is None else (
+            correction.gamma, correction.brightness, correction.white_balance)
+
+        key = ('packets', effect.get_key(), correction_key)
+        packets = self._get(key)
+
+        if packets is None:
+            packets = tuple(
+                tuple(
+                    keyboard._pack(msg)
+                    for msg in keyboard._colormap_messages(
+                        effect.render_colormap(i))
+                )
+                for i in range(effect.period)
+            )
+
+            size = sum(len(p) for frame in packets for p in frame)
+            self._put(key, packets, size)
+
+        return packets
+
+    def play(
+        self,
+        keyboard: Keyboard,
+        effect: PeriodicEffect,
+        fps: float,
+        loops: int = None,
+    ):
+        """Play the effect `loops` times, or forever."""
+
+        packets = self.get_packets(keyboard, effect)
+
+        start = time.monotonic()
+        index = 0
+
+        while loops is None or index < loops * effect.period:
+            with profiling.frame():
+                for msg_bytes in packets[index % effect.period]:
+                    keyboard._write_packed(msg_bytes)
+
+            index += 1
+
+            delay = start + index / fps - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
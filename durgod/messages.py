@@ -2,6 +2,7 @@ import abc
 import struct
 
 from .constants import *
+from .correction import ColorCorrection
 
 
 class Message(abc.ABC):
@@ -13,6 +14,23 @@ class Message(abc.ABC):
 
         pass
 
+    def unpack(data: bytes) -> 'Message':
+        """
+        Unpack a message from bytes, e.g. from a USB capture.
+
+        Trailing padding is ignored. Subclasses unpack only their own type;
+        on `Message` itself, the type is chosen by the opcode prefix.
+        """
+
+        return unpack_message(data)
+
+
+def _check_opcode(opcode: bytes, msg: Message):
+    # unpacked data comes from outside, so this must not be an assert
+    if opcode != msg.opcode:
+        raise ValueError(
+            f'opcode {opcode.hex()} does not match {type(msg).__name__}')
+
 
 class KeymapStartMessage(Message):
     """Sent on changing the custom layer mapping, before the actual data."""
@@ -24,6 +42,17 @@ class KeymapStartMessage(Message):
     def pack(self) -> bytes:
         return struct.pack('< 4s i', self.opcode, self.magic)
 
+    def unpack(data: bytes) -> 'KeymapStartMessage':
+        opcode, magic = struct.unpack_from('< 4s i', data)
+
+        msg = KeymapStartMessage()
+        _check_opcode(opcode, msg)
+
+        if magic != msg.magic:
+            raise ValueError(f'unexpected magic: {magic:#x}')
+
+        return msg
+
 
 class KeymapRowMessage(Message):
     """Sent on changing the custom layer mapping, contains actual mapping data."""
@@ -31,24 +60,44 @@ class KeymapRowMessage(Message):
     def __init__(
         self,
         index: int,
-        keys: list[Key],
+        keys: list[Key] | bytes,
     ):
+        """
+        `keys` is either a list of 8 keys,
+        or their 32 already encoded little-endian bytes.
+        """
+
         assert 0 <= index <= 15
-        assert len(keys) == 8
+
+        if isinstance(keys, (bytes, bytearray, memoryview)):
+            assert len(keys) == 32
+        else:
+            assert len(keys) == 8
 
         self.opcode = b'\x03\x05\x81\x0f'
         self.index = index
         self.keys = keys
 
     def pack(self) -> bytes:
-        entries = b''.join(map(lambda k: k.to_bytes(4, 'little'), self.keys))
+        entries = self.keys
 
-        return struct.pack(
-            '< 4s i 32s',
-            self.opcode,
-            self.index,
+        if not isinstance(entries, (bytes, bytearray, memoryview)):
+            entries = b''.join(map(lambda k: k.to_bytes(4, 'little'), entries))
+
+        return b''.join([
+            struct.pack('< 4s i', self.opcode, self.index),
             entries,
-        )
+        ])
+
+    def unpack(data: bytes) -> 'KeymapRowMessage':
+        opcode, index, entries = struct.unpack_from('< 4s i 32s', data)
+
+        keys = [Key(k) for k in struct.unpack('< 8I', entries)]
+
+        msg = KeymapRowMessage(index, keys)
+        _check_opcode(opcode, msg)
+
+        return msg
 
 
 class KeymapEndMessage(Message):
@@ -60,6 +109,14 @@ class KeymapEndMessage(Message):
     def pack(self):
         return struct.pack('< 4s', self.opcode)
 
+    def unpack(data: bytes) -> 'KeymapEndMessage':
+        opcode, = struct.unpack_from('< 4s', data)
+
+        msg = KeymapEndMessage()
+        _check_opcode(opcode, msg)
+
+        return msg
+
 
 class RgbStateMessage(Message):
     """Sent to enable or disable RGB lighting."""
@@ -71,6 +128,14 @@ class RgbStateMessage(Message):
     def pack(self) -> bytes:
         return struct.pack('< 3s b', self.opcode, self.stop)
 
+    def unpack(data: bytes) -> 'RgbStateMessage':
+        opcode, stop = struct.unpack_from('< 3s b', data)
+
+        msg = RgbStateMessage(RgbState(stop))
+        _check_opcode(opcode, msg)
+
+        return msg
+
 
 class RgbEffectMessage(Message):
     """Sent to start a particular RGB lighting effect."""
@@ -88,7 +153,7 @@ class RgbEffectMessage(Message):
         assert color1 & 0xffffff == color1
         assert 1 <= speed <= 3
         assert 1 <= brightness <= 9
-        assert color2 & 0xffffff == color1
+        assert color2 & 0xffffff == color2
 
         self.opcode = b'\x03\x06\x80'
         self.effect = effect
@@ -112,6 +177,31 @@ class RgbEffectMessage(Message):
             self.color2.to_bytes(3, 'big'),
         )
 
+    def unpack(data: bytes) -> 'RgbEffectMessage':
+        (
+            opcode,
+            effect,
+            reversed,
+            color1,
+            speed,
+            brightness,
+            base_speed,
+            color2,
+        ) = struct.unpack_from('< 3s b ? x 3s b b b 3s', data)
+
+        msg = RgbEffectMessage(
+            effect=RgbEffect(effect),
+            reversed=reversed,
+            color1=int.from_bytes(color1, 'big'),
+            speed=speed,
+            brightness=brightness,
+            base_speed=base_speed,
+            color2=int.from_bytes(color2, 'big'),
+        )
+        _check_opcode(opcode, msg)
+
+        return msg
+
 
 class RgbBrightnessMessage(Message):
     """Sent to control overall RGB brighness."""
@@ -125,6 +215,14 @@ class RgbBrightnessMessage(Message):
     def pack(self) -> bytes:
         return struct.pack('< 3s b', self.opcode, self.brightness)
 
+    def unpack(data: bytes) -> 'RgbBrightnessMessage':
+        opcode, brightness = struct.unpack_from('< 3s b', data)
+
+        msg = RgbBrightnessMessage(brightness)
+        _check_opcode(opcode, msg)
+
+        return msg
+
 
 class RgbSpeedMessage(Message):
     """Sent to control RGB effect speed."""
@@ -138,6 +236,14 @@ class RgbSpeedMessage(Message):
     def pack(self) -> bytes:
         return struct.pack('< 3s b', self.opcode, self.speed)
 
+    def unpack(data: bytes) -> 'RgbSpeedMessage':
+        opcode, speed = struct.unpack_from('< 3s b', data)
+
+        msg = RgbSpeedMessage(speed)
+        _check_opcode(opcode, msg)
+
+        return msg
+
 
 class RgbColormapStartMessage(Message):
     """Sent before the data for the per-key RGB lighting."""
@@ -148,21 +254,38 @@ class RgbColormapStartMessage(Message):
     def pack(self) -> bytes:
         return struct.pack('< 3s', self.opcode)
 
+    def unpack(data: bytes) -> 'RgbColormapStartMessage':
+        opcode, = struct.unpack_from('< 3s', data)
+
+        msg = RgbColormapStartMessage()
+        _check_opcode(opcode, msg)
+
+        return msg
+
 
 class RgbColormapRowMessage(Message):
     """Sent to control the per-key RGB lighting."""
 
-    def __init__(self, index: int, colors: list[int]):
+    def __init__(
+        self,
+        index: int,
+        colors: list[int],
+        correction: ColorCorrection = None,
+    ):
         assert 0 <= index <= 9
         assert len(colors) == 14
 
         self.opcode = b'\x03\x18\x08'
         self.index = index
         self.colors = colors
+        self.correction = correction
 
     def pack(self) -> bytes:
         entries = b''.join(map(lambda c: c.to_bytes(3, 'big'), self.colors))
 
+        if self.correction is not None:
+            entries = self.correction.apply(entries)
+
         return struct.pack(
             '< 3s b 42s',
             self.opcode,
@@ -170,6 +293,19 @@ class RgbColormapRowMessage(Message):
             entries,
         )
 
+    def unpack(data: bytes) -> 'RgbColormapRowMessage':
+        opcode, index, entries = struct.unpack_from('< 3s b 42s', data)
+
+        colors = [
+            int.from_bytes(entries[i:i+3], 'big')
+            for i in range(0, len(entries), 3)
+        ]
+
+        msg = RgbColormapRowMessage(index, colors)
+        _check_opcode(opcode, msg)
+
+        return msg
+
 
 class RgbColormapEndMessage(Message):
     """Sent after the data for the per-key RGB lighting."""
@@ -179,3 +315,43 @@ class RgbColormapEndMessage(Message):
 
     def pack(self) -> bytes:
         return struct.pack('< 3s', self.opcode)
+
+    def unpack(data: bytes) -> 'RgbColormapEndMessage':
+        opcode, = struct.unpack_from('< 3s', data)
+
+        msg = RgbColormapEndMessage()
+        _check_opcode(opcode, msg)
+
+        return msg
+
+
+MESSAGE_TYPES: dict[bytes, type[Message]] = {
+    b'\x03\x05\x80\x04': KeymapStartMessage,
+    b'\x03\x05\x81\x0f': KeymapRowMessage,
+    b'\x03\x05\x82\x00': KeymapEndMessage,
+    b'\x03\x06\x86': RgbStateMessage,
+    b'\x03\x06\x80': RgbEffectMessage,
+    b'\x03\x06\x82': RgbBrightnessMessage,
+    b'\x03\x06\x83': RgbSpeedMessage,
+    b'\x03\x19\x66': RgbColormapStartMessage,
+    b'\x03\x18\x08': RgbColormapRowMessage,
+    b'\x03\x19\x88': RgbColormapEndMessage,
+}
+"""Message types by their opcode prefix."""
+
+
+def get_message_type(data: bytes) -> type[Message]:
+    """Find a message type by the opcode prefix of the data, if known."""
+
+    return MESSAGE_TYPES.get(data[:4]) or MESSAGE_TYPES.get(data[:3])
+
+
+def unpack_message(data: bytes) -> Message:
+    """Unpack a message of any known type, or return `None`."""
+
+    message_type = get_message_type(data)
+
+    if message_type is None:
+        return None
+
+    return message_type.unpack(data)
@@ -0,0 +1,145 @@
+"""
+Per-model keyboard data.
+
+Adding a model only takes a new `Model` entry in `MODELS`.
+The data is kept in immutable tuples, shared between all `Keyboard`
+handles of that model; derived tables are built lazily on first use.
+"""
+
+import array
+
+from .constants import *
+
+
+def G(count: int = 0, **kwargs) -> dict:
+    """A shorthand for `Layout.Group` arguments."""
+
+    return dict(count=count, **kwargs)
+
+
+class Model:
+    """
+    Static data describing a particular keyboard model.
+
+    Colormap dimensions are not part of it: they are fixed
+    by the format of `RgbColormapRowMessage`, and `Matrix` positions
+    are also the colormap indices of the keys' LEDs.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        keymap: tuple[Key, ...],
+        layout_width: float,
+        layout_height: float,
+        layout_groups: tuple[dict, ...],
+        white_balance: tuple[float, float, float] = (1.0, 1.0, 1.0),
+    ):
+        assert len(keymap) == Matrix.HEIGHT * Matrix.WIDTH
+        assert len(white_balance) == 3
+
+        self.name = name
+        self.keymap = tuple(keymap)
+        self.layout_width = layout_width
+        self.layout_height = layout_height
+        self.layout_groups = tuple(tuple(g.items()) for g in layout_groups)
+        # default (red, green, blue) scales of `ColorCorrection`
+        self.white_balance = tuple(white_balance)
+
+        self._keymap_entries = None
+
+    def get_keymap_entries(self) -> array.array:
+        """The default keymap as keycodes. Shared, do not modify."""
+
+        if self._keymap_entries is None:
+            self._keymap_entries = array.array('I', self.keymap)
+
+        return self._keymap_entries
+
+    def get_layout(self) -> 'Layout':
+        """A new `Layout`, so callers may modify it freely."""
+
+        # imported here, because `keyboard` itself depends on this module
+        from .keyboard import Layout
+
+        return Layout(
+            width=self.layout_width,
+            height=self.layout_height,
+            groups=[Layout.Group(**dict(g)) for g in self.layout_groups],
+        )
+
+
+TENKEYLESS_KEYMAP: tuple[Key, ...] = (  # noqa
+    Key.ESC,    Key.NONE,   Key.F1,     Key.F2,     Key.F3,     Key.F4,     Key.F5,
+    Key.F6,     Key.F7,     Key.F8,     Key.F9,     Key.F10,    Key.F11,    Key.F12,
+    Key.PSCR,   Key.SLCK,   Key.PAUSE,  Key.NONE,   Key.NONE,   Key.NONE,   Key.NONE,
+
+    Key.GRAVE,  Key._1,     Key._2,     Key._3,     Key._4,     Key._5,     Key._6,
+    Key._7,     Key._8,     Key._9,     Key._0,     Key.MINUS,  Key.EQUAL,  Key.BSPACE,
+    Key.INSERT, Key.HOME,   Key.PGUP,   Key.NONE,   Key.NONE,   Key.NONE,   Key.NONE,
+
+    Key.TAB,    Key.Q,      Key.W,      Key.E,      Key.R,      Key.T,      Key.Y,
+    Key.U,      Key.I,      Key.O,      Key.P,      Key.LBRC,   Key.RBRC,   Key.BSLASH,
+    Key.DELETE, Key.END,    Key.PGDOWN, Key.NONE,   Key.NONE,   Key.NONE,   Key.NONE,
+
+    Key.CAPS,   Key.A,      Key.S,      Key.D,      Key.F,      Key.G,      Key.H,
+    Key.J,      Key.K,      Key.L,      Key.SCOLON, Key.QUOTE,  Key.NONE,   Key.ENTER,
+    Key.NONE,   Key.NONE,   Key.NONE,   Key.NONE,   Key.NONE,   Key.NONE,   Key.NONE,
+
+    Key.LSHIFT, Key.NONE,   Key.Z,      Key.X,      Key.C,      Key.V,      Key.B,
+    Key.N,      Key.M,      Key.COMMA,  Key.DOT,    Key.SLASH,  Key.NONE,   Key.RSHIFT,
+    Key.NONE,   Key.UP,     Key.NONE,   Key.NONE,   Key.NONE,   Key.NONE,   Key.NONE,
+
+    Key.LCTRL,  Key.LGUI,   Key.LALT,   Key.NONE,   Key.NONE,   Key.NONE,   Key.SPACE,
+    Key.NONE,   Key.NONE,   Key.NONE,   Key.RALT,   Key.FN,     Key.APP,    Key.RCTRL,
+    Key.LEFT,   Key.DOWN,   Key.RIGHT,  Key.NONE,   Key.NONE,   Key.NONE,   Key.NONE,
+
+    Key.WINLOCK_WIN, Key.MAGIC_PADDING,
+)
+
+TENKEYLESS_LAYOUT_GROUPS: tuple[dict, ...] = (
+    G(1), G(skip=1, x=1), G(4), G(x=0.5), G(4), G(x=0.5), G(4),
+    G(x=0.25), G(3),
+    G(skip=4),
+
+    G(row=True, y=0.5), G(13), G(1, w=2),
+    G(x=0.25), G(3),
+    G(skip=4),
+
+    G(row=True), G(1, w=1.5), G(12), G(1, w=1.5),
+    G(x=0.25), G(3),
+    G(skip=4),
+
+    G(row=True), G(1, w=1.75), G(11), G(skip=1), G(1, w=2.25),
+    G(skip=3),
+    G(skip=4),
+
+    G(row=True), G(1, w=2.25), G(skip=1), G(10), G(skip=1), G(1, w=2.75),  # noqa
+    G(skip=1, x=1.25), G(1), G(skip=1),
+    G(skip=4),
+
+    G(row=True), G(3, w=1.25), G(skip=3), G(1, w=6.25), G(skip=3), G(4, w=1.25),  # noqa
+    G(x=0.25), G(3),
+    G(skip=4),
+)
+
+TENKEYLESS = Model(
+    name='Taurus K320',
+    keymap=TENKEYLESS_KEYMAP,
+    layout_width=18.25,
+    layout_height=6.5,
+    layout_groups=TENKEYLESS_LAYOUT_GROUPS,
+)
+
+MODELS: dict[KeyboardId, Model] = {
+    KeyboardId.K320: TENKEYLESS,
+    KeyboardId.K320_NEBULA: TENKEYLESS,
+}
+"""Known models by their USB product id."""
+
+DEFAULT_MODEL = TENKEYLESS
+"""Used for keyboards with an unknown product id."""
+
+
+def get_model(product_id: KeyboardId) -> Model:
+    return MODELS.get(product_id, DEFAULT_MODEL)
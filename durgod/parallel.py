@@ -0,0 +1,171 @@
+"""
+Rendering colormap frames in multiple processes.
+
+Frames are rendered by a pool of worker processes directly into
+a shared memory ring buffer, and sent to the keyboard by the single
+process that owns it. Frame data is never pickled.
+"""
+
+import multiprocessing
+import multiprocessing.shared_memory
+import struct
+import time
+from typing import Callable
+
+from .keyboard import Keyboard, Colormap
+
+
+FRAME_SIZE = Colormap.ROW_COUNT * Colormap.ROW_LENGTH * 3
+"""Size of a frame: 3 bytes (R, G, B) for every colormap entry."""
+
+Effect = Callable[[int, memoryview], None]
+"""
+Renders a frame by its index into a `FRAME_SIZE`-byte buffer.
+
+Must be picklable, e.g. a module-level function.
+"""
+
+
+class FrameRing:
+    """
+    A ring buffer of frames in shared memory.
+
+    Every slot starts with a sequence number, which is written only
+    after the frame itself, so that readers can tell which frame
+    a slot holds, and whether it is complete.
+    """
+
+    HEADER = struct.Struct('< Q')
+
+    def __init__(self, slots: int = 8, name: str = None):
+        assert slots > 0
+
+        self.slots = slots
+        self.slot_size = FrameRing.HEADER.size + FRAME_SIZE
+
+        if name is None:
+            self.shm = multiprocessing.shared_memory.SharedMemory(
+                create=True, size=slots * self.slot_size)
+            self.shm.buf[:] = bytes(len(self.shm.buf))
+            self.owner = True
+        else:
+            self.shm = multiprocessing.shared_memory.SharedMemory(name)
+            self.owner = False
+
+        self.name = self.shm.name
+
+    def _offset(self, seq: int) -> int:
+        return (seq % self.slots) * self.slot_size
+
+    def write(self, seq: int, effect: Effect):
+        """Render frame `seq` into its slot."""
+
+        offset = self._offset(seq)
+        start = offset + FrameRing.HEADER.size
+
+        # stored sequence numbers are shifted by one, so 0 means "empty"
+        FrameRing.HEADER.pack_into(self.shm.buf, offset, 0)
+        effect(seq, self.shm.buf[start:start + FRAME_SIZE])
+        FrameRing.HEADER.pack_into(self.shm.buf, offset, seq + 1)
+
+    def read(self, seq: int) -> bytes:
+        """
+        Copy frame `seq` out of its slot.
+
+        Returns `None` if the slot holds a different or incomplete frame.
+        """
+
+        offset = self._offset(seq)
+        start = offset + FrameRing.HEADER.size
+
+        stored, = FrameRing.HEADER.unpack_from(self.shm.buf, offset)
+        frame = bytes(self.shm.buf[start:start + FRAME_SIZE])
+        stored_after, = FrameRing.HEADER.unpack_from(self.shm.buf, offset)
+
+        if stored != seq + 1 or stored_after != stored:
+            return None
+
+        return frame
+
+    def close(self):
+        self.shm.close()
+
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self) -> 'FrameRing':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def frame_to_colormap(frame: bytes) -> Colormap:
+    return Colormap([
+        int.from_bytes(frame[i:i+3], 'big')
+        for i in range(0, len(frame), 3)
+    ])
+
+
+_worker_ring: FrameRing = None
+_worker_effect: Effect = None
+
+
+def _init_worker(name: str, slots: int, effect: Effect):
+    global _worker_ring, _worker_effect
+
+    _worker_ring = FrameRing(slots, name)
+    _worker_effect = effect
+
+
+def _render(seq: int):
+    _worker_ring.write(seq, _worker_effect)
+
+
+def play_parallel(
+    keyboard: Keyboard,
+    effect: Effect,
+    frames: int,
+    fps: float = None,
+    workers: int = None,
+    slots: int = 8,
+):
+    """
+    Render `frames` frames of an effect in a process pool,
+    and send them to the keyboard in order.
+
+    At most `slots` frames are rendered ahead of the one being sent,
+    so a slot is never overwritten before it is read.
+    """
+
+    with FrameRing(slots) as ring:
+        with multiprocessing.Pool(
+            workers,
+            initializer=_init_worker,
+            initargs=(ring.name, slots, effect),
+        ) as pool:
+            pending = {
+                seq: pool.apply_async(_render, (seq,))
+                for seq in range(min(slots, frames))
+            }
+
+            start = time.monotonic()
+
+            for seq in range(frames):
+                # re-raises any exception from the worker
+                pending.pop(seq).get()
+
+                frame = ring.read(seq)
+                if frame is None:
+                    raise RuntimeError(f'frame {seq} is missing or torn')
+
+                if fps is not None:
+                    delay = start + seq / fps - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+
+                keyboard.apply_colormap(frame_to_colormap(frame))
+
+                if seq + slots < frames:
+                    pending[seq + slots] = \
+                        pool.apply_async(_render, (seq + slots,))
@@ -0,0 +1,208 @@
+"""
+Choosing between firmware and host rendering of lighting effects.
+
+Effects the keyboard can run by itself (see `RgbEffect`) cost a single
+message to start, while host-rendered ones are streamed frame by frame.
+`plan` picks the firmware whenever it can render what is asked for.
+"""
+
+from .constants import *
+from .effects import *
+from .keyboard import Keyboard, Layout
+from .loopcache import LoopCache
+
+
+class Lighting:
+    """
+    A high-level lighting request.
+
+    `speed` is in the firmware's units (1 to 3), `brightness` is a fraction
+    of the maximum. Colors left as `None` let the effect choose its own.
+
+    A wave without a color is rainbow-colored, like the firmware's `WAVES`,
+    whether or not it ends up rendered on the host; one with a color
+    is always rendered on the host.
+    """
+
+    STATIC = 'static'
+    BREATHING = 'breathing'
+    RAINBOW = 'rainbow'
+    WAVE = 'wave'
+    TWO_COLORS = 'two_colors'
+
+    def __init__(
+        self,
+        effect: str,
+        color1: int = None,
+        color2: int = None,
+        speed: float = 1,
+        brightness: float = 1.0,
+        reversed: bool = False,
+    ):
+        assert 0 < brightness <= 1
+
+        self.effect = effect
+        self.color1 = color1
+        self.color2 = color2
+        self.speed = speed
+        self.brightness = brightness
+        self.reversed = reversed
+
+
+# the firmware's waves are rainbow-colored, so only a wave
+# without a color is one, and the host renders it the same way
+FIRMWARE_EFFECTS: dict[str, tuple[RgbEffect, int]] = {
+    Lighting.RAINBOW: (RgbEffect.RAINBOW, 0),
+    Lighting.WAVE: (RgbEffect.WAVES, 0),
+    Lighting.TWO_COLORS: (RgbEffect.TWO_COLORS, 2),
+}
+"""Firmware effects by request, with the number of colors they take."""
+
+HOST_EFFECTS: dict[str, int] = {
+    Lighting.STATIC: 1,
+    Lighting.BREATHING: 1,
+    Lighting.RAINBOW: 0,
+    Lighting.WAVE: 1,
+    Lighting.TWO_COLORS: 2,
+}
+"""Host-rendered effects by request, with the number of colors they take."""
+
+HOST_PERIOD = 240
+"""Frames in a loop of a host-rendered effect at speed 1."""
+
+
+class Plan:
+    """
+    How to show a `Lighting` request: either `firmware_args`
+    for `Keyboard.apply_rgb_effect`, or a host-rendered `effect`.
+    """
+
+    def __init__(
+        self,
+        firmware_args: dict = None,
+        effect: PeriodicEffect = None,
+    ):
+        assert (firmware_args is None) != (effect is None)
+
+        self.firmware_args = firmware_args
+        self.effect = effect
+
+    def is_firmware(self) -> bool:
+        return self.firmware_args is not None
+
+    def apply(
+        self,
+        keyboard: Keyboard,
+        cache: LoopCache = None,
+        fps: float = 30,
+        loops: int = None,
+    ):
+        """
+        Start the effect on the keyboard.
+
+        Firmware effects return immediately, host-rendered ones play
+        for `loops` loops, or forever; static colors are sent once.
+        """
+
+        if self.firmware_args is not None:
+            keyboard.apply_rgb_effect(**self.firmware_args)
+            return
+
+        if self.effect.period == 1:
+            keyboard.apply_colormap(self.effect.render_colormap(0))
+            return
+
+        if cache is None:
+            cache = LoopCache()
+
+        cache.play(keyboard, self.effect, fps, loops)
+
+
+def _to_level(value: float, levels: int, tolerance: float) -> int:
+    level = round(value)
+
+    if not 1 <= level <= levels or abs(value - level) > tolerance:
+        return None
+
+    return level
+
+
+def _plan_firmware(lighting: Lighting, tolerance: float) -> dict:
+    if lighting.effect not in FIRMWARE_EFFECTS:
+        return None
+
+    effect, color_count = FIRMWARE_EFFECTS[lighting.effect]
+
+    colors = [lighting.color1, lighting.color2]
+    if any(c is not None for c in colors[color_count:]):
+        return None
+
+    speed = _to_level(lighting.speed, 3, tolerance)
+    brightness = _to_level(lighting.brightness * 9, 9, tolerance)
+
+    if speed is None or brightness is None:
+        return None
+
+    return dict(
+        effect=effect,
+        speed=speed,
+        brightness=brightness,
+        reversed=lighting.reversed,
+        color1=0xffffff if lighting.color1 is None else lighting.color1,
+        color2=0xffffff if lighting.color2 is None else lighting.color2,
+    )
+
+
+def _plan_host(lighting: Lighting, layout: Layout) -> PeriodicEffect:
+    period = max(round(HOST_PERIOD / lighting.speed), 1)
+    colors = [
+        scale_color(0xffffff if c is None else c, lighting.brightness)
+        for c in (lighting.color1, lighting.color2)
+    ]
+    color = colors[0]
+
+    if lighting.effect == Lighting.STATIC:
+        return Static(color)
+
+    if lighting.effect == Lighting.BREATHING:
+        return Breathing(color, period)
+
+    if lighting.effect == Lighting.RAINBOW:
+        return Rainbow(layout, period, lighting.brightness, lighting.reversed)
+
+    if lighting.effect == Lighting.WAVE:
+        return Wave(layout, lighting.color1, period, lighting.reversed,
+                    lighting.brightness)
+
+    if lighting.effect == Lighting.TWO_COLORS:
+        return TwoColors(layout, *colors, period, lighting.reversed)
+
+    raise ValueError(f'cannot render {lighting.effect} on the host')
+
+
+def plan(lighting: Lighting, layout: Layout, tolerance: float = 0.05) -> Plan:
+    """
+    Plan a lighting request, preferring a firmware effect.
+
+    A firmware effect is used if it takes the requested colors, and the
+    requested speed and brightness are within `tolerance` of one of its
+    discrete levels (1 to 3 and 1 to 9, respectively).
+
+    Raises `ValueError` for unknown effects, or colors the effect
+    does not take, e.g. `color1` of a rainbow.
+    """
+
+    if lighting.effect not in HOST_EFFECTS:
+        raise ValueError(f'unknown effect: {lighting.effect}')
+
+    colors = [lighting.color1, lighting.color2]
+    for i in range(HOST_EFFECTS[lighting.effect], len(colors)):
+        if colors[i] is not None:
+            raise ValueError(f'{lighting.effect} does not take color{i + 1}')
+
+    firmware_args = _plan_firmware(lighting, tolerance)
+
+    if firmware_args is not None:
+        return Plan(firmware_args=firmware_args)
+
+    return Plan(effect=_plan_host(lighting, layout))
@@ -0,0 +1,316 @@
+"""
+Opt-in profiling of the render and write loop.
+
+When enabled, with `enable` or the `DURGOD_PROFILE` environment
+variable set to an output path, the time spent in every stage
+(render, correct, encode, write) is recorded per frame. At exit,
+a collapsed-stack file for flamegraph tools is written to that path,
+and a per-stage summary to `<path>.txt`.
+
+Stages nest, e.g. correction happens while encoding a colormap row,
+so it is reported as `frame;encode;correct`. Stages nest per thread,
+so several threads driving keyboards, like in `sync`, are profiled
+together. Allocations are only measured for frames of the thread
+that started profiling, as tracemalloc's peak is process-wide.
+"""
+
+import atexit
+import collections
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+
+class _NullContext:
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *args):
+        pass
+
+
+_NULL = _NullContext()
+
+
+class _Stage:
+    def __init__(self, profiler: 'Profiler', name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler.push(self.name)
+        self.start = time.perf_counter()
+
+    def __exit__(self, *args):
+        duration = time.perf_counter() - self.start
+
+        profiler = self.profiler
+        key = profiler.pop(duration)
+
+        profiler.current[key] += duration
+
+
+class _Frame:
+    def __init__(self, profiler: 'Profiler'):
+        self.profiler = profiler
+
+    def __enter__(self):
+        profiler = self.profiler
+
+        profiler.push('frame')
+
+        self.trace = profiler.trace_allocations \
+            and threading.get_ident() == profiler.thread
+
+        if self.trace:
+            tracemalloc.reset_peak()
+            self.memory, _ = tracemalloc.get_traced_memory()
+
+        self.start = time.perf_counter()
+
+    def __exit__(self, *args):
+        profiler = self.profiler
+
+        duration = time.perf_counter() - self.start
+        profiler.pop(duration)
+
+        current = profiler.current
+        current['frame'] = duration
+
+        if self.trace:
+            _, peak = tracemalloc.get_traced_memory()
+
+        with profiler.lock:
+            # stages run just before a frame, like rendering, count towards it
+            for key, value in current.items():
+                profiler.frames[key].append(value)
+
+            if self.trace:
+                if profiler.traced_count % profiler.snapshot_interval == 0:
+                    profiler.take_snapshot()
+
+                profiler.allocations.append(peak - self.memory)
+                profiler.traced_count += 1
+
+            profiler.frame_count += 1
+
+        current.clear()
+
+
+class Profiler:
+    """Collects per-stage timings; see the module documentation."""
+
+    def __init__(
+        self,
+        path: str,
+        trace_allocations: bool = False,
+        max_frames: int = 100_000,
+        snapshot_interval: int = 100,
+    ):
+        self.path = path
+        self.trace_allocations = trace_allocations
+        self.snapshot_interval = snapshot_interval
+        self.snapshot: tracemalloc.Snapshot = None
+        self.thread = threading.get_ident()
+
+        # stacks of open stages, and timings of the frame being built,
+        # are per thread; the aggregates below are shared, under `lock`
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+        self.totals: collections.Counter[str] = collections.Counter()
+        self.self_totals: collections.Counter[str] = collections.Counter()
+        self.frames: collections.defaultdict[str, collections.deque] = \
+            collections.defaultdict(
+                lambda: collections.deque(maxlen=max_frames))
+        self.allocations: collections.deque[int] = \
+            collections.deque(maxlen=max_frames)
+        self.frame_count = 0
+        self.traced_count = 0
+
+        if trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _get_local(self) -> threading.local:
+        local = self.local
+
+        if not hasattr(local, 'stack'):
+            local.stack = []
+            local.children = []
+            local.current = collections.Counter()
+
+        return local
+
+    @property
+    def stack(self) -> list[str]:
+        """Names of the current thread's open stages."""
+
+        return self._get_local().stack
+
+    @property
+    def current(self) -> collections.Counter[str]:
+        """Timings of the current thread's frame being built."""
+
+        return self._get_local().current
+
+    def stage(self, name: str):
+        return _Stage(self, name)
+
+    def push(self, name: str):
+        local = self._get_local()
+        local.stack.append(name)
+        local.children.append(0.0)
+
+    def pop(self, duration: float) -> str:
+        """
+        Leave the innermost stage, which took `duration` in total.
+
+        Returns its stack key. The duration is added to `totals`, the time
+        spent outside any nested stage to `self_totals`, and the duration
+        to the parent's nested time.
+        """
+
+        local = self._get_local()
+        stack = local.stack
+        children = local.children
+
+        key = ';'.join(stack)
+        stack.pop()
+        self_time = duration - children.pop()
+
+        if children:
+            children[-1] += duration
+
+        with self.lock:
+            self.totals[key] += duration
+            self.self_totals[key] += self_time
+
+        return key
+
+    def take_snapshot(self):
+        """Sample the live allocations, reported in the summary."""
+
+        self.snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, '<frozen *>'),
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        ])
+
+    def frame(self):
+        # frames do not nest, e.g. a colormap applied by a loop player
+        if 'frame' in self.stack:
+            return _NULL
+
+        return _Frame(self)
+
+    def get_collapsed(self) -> str:
+        """
+        Self time per stack, in microseconds, one stack per line.
+
+        As flamegraph tools expect, the time of a stack excludes
+        the time of the stacks nested in it.
+        """
+
+        return ''.join(
+            f'{key} {round(total * 1e6)}\n'
+            for key, total in sorted(self.self_totals.items())
+            if round(total * 1e6) > 0
+        )
+
+    def get_summary(self) -> str:
+        lines = [f'frames: {self.frame_count}']
+        lines.append(
+            f'{"stage":<32} {"frames":>8} {"mean ms":>10} '
+            f'{"p95 ms":>10} {"max ms":>10}'
+        )
+
+        for key in sorted(self.frames):
+            values = sorted(self.frames[key])
+            mean = sum(values) / len(values)
+            p95 = values[min(int(len(values) * 0.95), len(values) - 1)]
+
+            lines.append(
+                f'{key:<32} {len(values):>8} {mean * 1e3:>10.3f} '
+                f'{p95 * 1e3:>10.3f} {values[-1] * 1e3:>10.3f}'
+            )
+
+        if self.trace_allocations and self.allocations:
+            mean = sum(self.allocations) / len(self.allocations)
+            lines.append(f'allocated per frame: {mean:.0f} bytes on average, '
+                         f'{max(self.allocations)} at most')
+
+            lines.append('top allocation sites, as last sampled:')
+
+            for stat in self.snapshot.statistics('lineno')[:10]:
+                lines.append(f'  {stat}')
+
+        return '\n'.join(lines) + '\n'
+
+    def dump(self):
+        # threads may still be running, e.g. daemon threads at exit
+        with self.lock:
+            collapsed = self.get_collapsed()
+            summary = self.get_summary()
+
+        with open(self.path, 'w') as f:
+            f.write(collapsed)
+
+        with open(self.path + '.txt', 'w') as f:
+            f.write(summary)
+
+
+_profiler: Profiler = None
+
+
+def enable(
+    path: str = 'durgod-profile.folded',
+    trace_allocations: bool = False,
+) -> Profiler:
+    """Start profiling, and dump the results at exit."""
+
+    global _profiler
+
+    if _profiler is not None:
+        return _profiler
+
+    _profiler = Profiler(path, trace_allocations)
+    atexit.register(_dump)
+
+    return _profiler
+
+
+def _dump():
+    try:
+        _profiler.dump()
+    except OSError as e:
+        print(f'durgod: cannot write profile: {e}', file=sys.stderr)
+
+
+def get_profiler() -> Profiler:
+    return _profiler
+
+
+def stage(name: str):
+    """A context manager timing a stage, or doing nothing if disabled."""
+
+    if _profiler is None:
+        return _NULL
+
+    return _profiler.stage(name)
+
+
+def frame():
+    """A context manager timing a whole frame, or doing nothing if disabled."""
+
+    if _profiler is None:
+        return _NULL
+
+    return _profiler.frame()
+
+
+if os.environ.get('DURGOD_PROFILE'):
+    enable(
+        os.environ['DURGOD_PROFILE'],
+        trace_allocations=bool(os.environ.get('DURGOD_PROFILE_MEMORY')),
+    )
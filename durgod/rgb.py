@@ -0,0 +1,171 @@
+from .constants import *
+from .keyboard import Keyboard, Colormap
+from .messages import *
+
+
+def _get_effect_args(msg: RgbEffectMessage) -> dict:
+    return dict(
+        effect=msg.effect,
+        speed=msg.speed,
+        brightness=msg.brightness,
+        reversed=msg.reversed,
+        color1=msg.color1,
+        color2=msg.color2,
+        base_speed=msg.base_speed,
+    )
+
+
+class RgbController:
+    """
+    Tracks the RGB state of a keyboard, to send only the messages
+    needed for each change.
+
+    The state is unknown until the first change, so the first one
+    is always sent in full. Changes made to the keyboard bypassing
+    the controller must be followed by `invalidate`.
+    """
+
+    def __init__(self, keyboard: Keyboard):
+        self.keyboard = keyboard
+
+        self.state: RgbState = None
+        self.effect: RgbEffectMessage = None
+
+    def invalidate(self):
+        """Forget the tracked state."""
+
+        self.state = None
+        self.effect = None
+
+    def _send(self, messages: list[Message]) -> list[Message]:
+        for msg in messages:
+            self.keyboard._write(msg)
+
+        return messages
+
+    def _plan_effect(self, effect: RgbEffectMessage) -> list[Message]:
+        messages: list[Message] = []
+
+        if self.state != RgbState.ON:
+            messages.append(RgbStateMessage(RgbState.ON))
+
+        if self.effect is not None:
+            current = _get_effect_args(self.effect)
+            changed = {
+                name for name, value in _get_effect_args(effect).items()
+                if current[name] != value
+            }
+
+            if not changed:
+                return messages
+
+            if changed == {'brightness'}:
+                messages.append(RgbBrightnessMessage(effect.brightness))
+                return messages
+
+            if changed == {'speed'}:
+                messages.append(RgbSpeedMessage(effect.speed))
+                return messages
+
+        messages.append(effect)
+        return messages
+
+    def apply_rgb_effect(
+        self,
+        effect: RgbEffect = RgbEffect.PLAY,
+        speed: int = 1,
+        brightness: int = 9,
+        reversed: bool = False,
+        color1: int = 0xffffff,
+        color2: int = 0xffffff,
+        base_speed: int = 1,
+    ) -> list[Message]:
+        """
+        Same as `Keyboard.apply_rgb_effect`, but only sends what changed.
+
+        Returns the messages sent.
+        """
+
+        msg = RgbEffectMessage(
+            effect=effect,
+            speed=speed,
+            brightness=brightness,
+            reversed=reversed,
+            color1=color1,
+            color2=color2,
+            base_speed=base_speed,
+        )
+
+        messages = self._send(self._plan_effect(msg))
+
+        self.state = RgbState.ON
+        self.effect = msg
+
+        return messages
+
+    def set_brightness(self, brightness: int) -> list[Message]:
+        """
+        Change the brightness of the current effect.
+
+        Sends nothing if the brightness is already set, and turns the lighting
+        on if it is off. If no effect is known, the brightness message
+        is sent as is.
+        """
+
+        if self.effect is None:
+            return self._send([RgbBrightnessMessage(brightness)])
+
+        args = _get_effect_args(self.effect)
+        args['brightness'] = brightness
+
+        return self.apply_rgb_effect(**args)
+
+    def set_speed(self, speed: int) -> list[Message]:
+        """
+        Change the speed of the current effect.
+
+        Sends nothing if the speed is already set, and turns the lighting
+        on if it is off. If no effect is known, the speed message
+        is sent as is.
+        """
+
+        if self.effect is None:
+            return self._send([RgbSpeedMessage(speed)])
+
+        args = _get_effect_args(self.effect)
+        args['speed'] = speed
+
+        return self.apply_rgb_effect(**args)
+
+    def _set_state(self, state: RgbState) -> list[Message]:
+        if self.state == state:
+            return []
+
+        messages = self._send([RgbStateMessage(state)])
+        self.state = state
+
+        return messages
+
+    def enable(self) -> list[Message]:
+        return self._set_state(RgbState.ON)
+
+    def disable(self) -> list[Message]:
+        return self._set_state(RgbState.OFF)
+
+    def toggle(self) -> list[Message]:
+        if self.state == RgbState.ON:
+            return self.disable()
+        else:
+            return self.enable()
+
+    def apply_colormap(self, colormap: Colormap, rows: list[int] = None):
+        """
+        Same as `Keyboard.apply_colormap`.
+
+        This replaces the current effect, so it is forgotten.
+        """
+
+        self.keyboard.apply_colormap(colormap, rows)
+
+        self.state = RgbState.OFF
+        self.effect = None
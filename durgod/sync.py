@@ -0,0 +1,161 @@
+"""
+Frame-aligned playback of the same animation on several keyboards.
+
+All boards share one monotonic clock: frame N is due on every board
+at `start + N / fps`. Each board is driven by its own thread, which
+starts writing a frame early by that board's measured write latency,
+so the frame lands on time. A board that falls behind skips frames
+instead of drifting, so all boards stay aligned indefinitely.
+"""
+
+import collections
+import math
+import threading
+import time
+from typing import Callable
+
+from .keyboard import Keyboard, Colormap
+
+
+class SyncedBoard:
+    """Playback state and statistics of a single keyboard."""
+
+    def __init__(self, keyboard: Keyboard, latency: float = 0.0):
+        self.keyboard = keyboard
+        self.latency = latency
+        self.sent = 0
+        self.skipped = 0
+
+
+class _FrameSource:
+    """Renders each frame once, for all the boards."""
+
+    def __init__(self, render: Callable[[int], Colormap], size: int):
+        self.render = render
+        self.size = size
+        self.frames: collections.OrderedDict[int, Colormap] = \
+            collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, index: int) -> Colormap:
+        with self.lock:
+            colormap = self.frames.get(index)
+
+            if colormap is None:
+                colormap = self.render(index)
+                self.frames[index] = colormap
+
+                while len(self.frames) > self.size:
+                    self.frames.popitem(last=False)
+
+            return colormap
+
+
+class SyncedPlayback:
+    """
+    Plays `render(n)` colormaps on several keyboards in lockstep.
+
+    `latencies` may give initial write latencies per keyboard, e.g.
+    from `ThroughputProfile.frame_latency`; they are then refined
+    from every write, with `smoothing` as the averaging weight.
+    """
+
+    def __init__(
+        self,
+        keyboards: list[Keyboard],
+        render: Callable[[int], Colormap],
+        fps: float,
+        latencies: list[float] = None,
+        smoothing: float = 0.2,
+    ):
+        assert fps > 0
+        assert 0 < smoothing <= 1
+
+        if latencies is None:
+            latencies = [0.0] * len(keyboards)
+
+        self.boards = [
+            SyncedBoard(keyboard, latency)
+            for keyboard, latency in zip(keyboards, latencies)
+        ]
+        self.source = _FrameSource(render, size=4 * len(keyboards))
+        self.fps = fps
+        self.smoothing = smoothing
+
+        self.start: float = None
+        self.stop_event = threading.Event()
+        self.errors: list[BaseException] = []
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _get_deadline(self, index: int) -> float:
+        return self.start + index / self.fps
+
+    def _run(self, board: SyncedBoard, frames: int):
+        index = 0
+
+        while not self.stop_event.is_set() \
+                and (frames is None or index < frames):
+            send_at = self._get_deadline(index) - board.latency
+            now = time.monotonic()
+
+            if now > send_at:
+                # the first frame that can still be sent in time
+                catch_up = math.ceil(
+                    (now + board.latency - self.start) * self.fps)
+
+                if catch_up > index:
+                    board.skipped += catch_up - index
+                    index = catch_up
+                    continue
+
+            colormap = self.source.get(index)
+
+            delay = send_at - time.monotonic()
+            if delay > 0 and self.stop_event.wait(delay):
+                break
+
+            write_start = time.monotonic()
+            board.keyboard.apply_colormap(colormap)
+            latency = time.monotonic() - write_start
+
+            board.latency += self.smoothing * (latency - board.latency)
+            board.sent += 1
+            index += 1
+
+    def _run_safely(self, board: SyncedBoard, frames: int):
+        try:
+            self._run(board, frames)
+        except BaseException as e:
+            self.errors.append(e)
+            self.stop()
+
+    def play(self, frames: int = None, lead: float = 0.1):
+        """
+        Play `frames` frames, or until `stop` is called.
+
+        The first frame is due after `lead` seconds, to give all
+        the boards' threads time to start.
+        """
+
+        self.stop_event.clear()
+        self.errors.clear()
+        self.start = time.monotonic() + lead
+
+        threads = [
+            threading.Thread(target=self._run_safely, args=(board, frames))
+            for board in self.boards
+        ]
+
+        for thread in threads:
+            thread.start()
+
+        try:
+            for thread in threads:
+                thread.join()
+        finally:
+            self.stop()
+
+        if self.errors:
+            raise self.errors[0]
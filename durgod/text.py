@@ -0,0 +1,203 @@
+"""
+Scrolling text on the key grid.
+
+Text is drawn with a tiny bitmap font onto a grid of "pixels",
+where every key covers the pixel at its center. The layout's
+rows are the pixel rows, and key units are the pixel columns.
+"""
+
+import collections
+import math
+
+from . import profiling
+from .keyboard import Colormap, Layout
+
+
+FONT_3X5: dict[str, tuple[int, ...]] = {
+    ' ': (0b000, 0b000, 0b000, 0b000, 0b000),
+    'A': (0b010, 0b101, 0b111, 0b101, 0b101),
+    'B': (0b110, 0b101, 0b110, 0b101, 0b110),
+    'C': (0b011, 0b100, 0b100, 0b100, 0b011),
+    'D': (0b110, 0b101, 0b101, 0b101, 0b110),
+    'E': (0b111, 0b100, 0b110, 0b100, 0b111),
+    'F': (0b111, 0b100, 0b110, 0b100, 0b100),
+    'G': (0b011, 0b100, 0b101, 0b101, 0b011),
+    'H': (0b101, 0b101, 0b111, 0b101, 0b101),
+    'I': (0b111, 0b010, 0b010, 0b010, 0b111),
+    'J': (0b001, 0b001, 0b001, 0b101, 0b010),
+    'K': (0b101, 0b101, 0b110, 0b101, 0b101),
+    'L': (0b100, 0b100, 0b100, 0b100, 0b111),
+    'M': (0b101, 0b111, 0b111, 0b101, 0b101),
+    'N': (0b110, 0b101, 0b101, 0b101, 0b101),
+    'O': (0b010, 0b101, 0b101, 0b101, 0b010),
+    'P': (0b110, 0b101, 0b110, 0b100, 0b100),
+    'Q': (0b010, 0b101, 0b101, 0b110, 0b011),
+    'R': (0b110, 0b101, 0b110, 0b101, 0b101),
+    'S': (0b011, 0b100, 0b010, 0b001, 0b110),
+    'T': (0b111, 0b010, 0b010, 0b010, 0b010),
+    'U': (0b101, 0b101, 0b101, 0b101, 0b111),
+    'V': (0b101, 0b101, 0b101, 0b101, 0b010),
+    'W': (0b101, 0b101, 0b111, 0b111, 0b101),
+    'X': (0b101, 0b101, 0b010, 0b101, 0b101),
+    'Y': (0b101, 0b101, 0b010, 0b010, 0b010),
+    'Z': (0b111, 0b001, 0b010, 0b100, 0b111),
+    '0': (0b111, 0b101, 0b101, 0b101, 0b111),
+    '1': (0b010, 0b110, 0b010, 0b010, 0b111),
+    '2': (0b110, 0b001, 0b010, 0b100, 0b111),
+    '3': (0b110, 0b001, 0b010, 0b001, 0b110),
+    '4': (0b101, 0b101, 0b111, 0b001, 0b001),
+    '5': (0b111, 0b100, 0b110, 0b001, 0b110),
+    '6': (0b011, 0b100, 0b111, 0b101, 0b111),
+    '7': (0b111, 0b001, 0b010, 0b010, 0b010),
+    '8': (0b111, 0b101, 0b111, 0b101, 0b111),
+    '9': (0b111, 0b101, 0b111, 0b001, 0b110),
+    '.': (0b000, 0b000, 0b000, 0b000, 0b010),
+    ',': (0b000, 0b000, 0b000, 0b010, 0b100),
+    ':': (0b000, 0b010, 0b000, 0b010, 0b000),
+    '!': (0b010, 0b010, 0b010, 0b000, 0b010),
+    '?': (0b110, 0b001, 0b010, 0b000, 0b010),
+    '-': (0b000, 0b000, 0b111, 0b000, 0b000),
+    '+': (0b000, 0b010, 0b111, 0b010, 0b000),
+    '%': (0b101, 0b001, 0b010, 0b100, 0b101),
+    '/': (0b001, 0b001, 0b010, 0b100, 0b100),
+    '$': (0b011, 0b110, 0b010, 0b011, 0b110),
+}
+"""A 3 pixels wide, 5 pixels high font, with rows as bit masks."""
+
+
+class GlyphAtlas:
+    """
+    All glyphs of a font, rasterized once into rows of 0/1 bytes.
+    """
+
+    def __init__(
+        self,
+        font: dict[str, tuple[int, ...]] = FONT_3X5,
+        width: int = 3,
+    ):
+        self.width = width
+        self.height = len(next(iter(font.values())))
+        self.offsets: dict[str, int] = {}
+
+        rows = [bytearray() for _ in range(self.height)]
+
+        for char, glyph in font.items():
+            self.offsets[char] = len(rows[0])
+
+            for row, mask in zip(rows, glyph):
+                row.extend(
+                    (mask >> (width - 1 - i)) & 1 for i in range(width)
+                )
+
+        self.rows = tuple(bytes(row) for row in rows)
+
+    def get_glyph_row(self, char: str, row: int) -> bytes:
+        """Pixels of a glyph's row; unknown characters are blank."""
+
+        offset = self.offsets.get(char.upper(), self.offsets.get(' '))
+        return self.rows[row][offset:offset + self.width]
+
+
+class TextRenderer:
+    """
+    Renders scrolling text into colormaps for a particular layout.
+
+    Rendered strings are cached, so every scrolling frame is just
+    a lookup of the key pixels in a window of the cached bitmap.
+    """
+
+    def __init__(
+        self,
+        layout: Layout,
+        atlas: GlyphAtlas = None,
+        spacing: int = 1,
+        cache_size: int = 64,
+    ):
+        if atlas is None:
+            atlas = GlyphAtlas()
+
+        self.atlas = atlas
+        self.spacing = spacing
+        self.cache_size = cache_size
+        self.cache: collections.OrderedDict[str, tuple[bytes, ...]] = \
+            collections.OrderedDict()
+
+        centers = layout.get_centers()
+        row_ys = sorted({y for (x, y) in centers if (x, y) != (0, 0)})
+
+        # align the text to the bottom rows, below the function keys
+        first_row = max(len(row_ys) - atlas.height, 0)
+
+        self.width = math.ceil(layout.width)
+        self.pixels: list[tuple[int, int]] = []
+
+        for (x, y) in centers:
+            if (x, y) == (0, 0):
+                self.pixels.append(None)
+                continue
+
+            row = row_ys.index(y) - first_row
+            if not 0 <= row < atlas.height:
+                self.pixels.append(None)
+                continue
+
+            self.pixels.append((row, int(x)))
+
+    def render(self, text: str) -> tuple[bytes, ...]:
+        """Rows of the whole text's bitmap, padded with a blank screen."""
+
+        rows = self.cache.get(text)
+
+        if rows is not None:
+            self.cache.move_to_end(text)
+            return rows
+
+        gap = bytes(self.spacing)
+        pad = bytes(self.width)
+
+        rows = tuple(
+            pad + gap.join(
+                self.atlas.get_glyph_row(c, row) for c in text
+            ) + pad
+            for row in range(self.atlas.height)
+        )
+
+        self.cache[text] = rows
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+        return rows
+
+    def get_frame_count(self, text: str) -> int:
+        """Number of offsets for the text to scroll fully through."""
+
+        return len(self.render(text)[0]) - self.width + 1
+
+    def get_frame(
+        self,
+        text: str,
+        offset: int,
+        color: int = 0xffffff,
+        background: int = 0x000000,
+    ) -> Colormap:
+        with profiling.stage('render'):
+            rows = self.render(text)
+            window = [row[offset:offset + self.width] for row in rows]
+
+            palette = (background, color)
+
+            return Colormap([
+                background if p is None else palette[window[p[0]][p[1]]]
+                for p in self.pixels
+            ])
+
+    def scroll(
+        self,
+        text: str,
+        color: int = 0xffffff,
+        background: int = 0x000000,
+    ):
+        """Iterate over colormaps of the text scrolling right to left."""
+
+        for offset in range(self.get_frame_count(text)):
+            yield self.get_frame(text, offset, color, background)
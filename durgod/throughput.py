@@ -0,0 +1,194 @@
+import json
+import os
+import time
+
+from .constants import *
+from .keyboard import Keyboard, Colormap
+
+
+class ThroughputProfile:
+    """
+    Measured colormap write latencies of a particular keyboard model.
+
+    Latencies are in seconds.
+    """
+
+    def __init__(
+        self,
+        product_id: KeyboardId,
+        firmware: int,
+        packet_latency: float,
+        frame_latency: float,
+    ):
+        self.product_id = product_id
+        self.firmware = firmware
+        self.packet_latency = packet_latency
+        self.frame_latency = frame_latency
+
+    def get_max_fps(self) -> float:
+        return 1 / self.frame_latency
+
+    def to_dict(self) -> dict:
+        return {
+            'product_id': int(self.product_id),
+            'firmware': self.firmware,
+            'packet_latency': self.packet_latency,
+            'frame_latency': self.frame_latency,
+        }
+
+    def from_dict(data: dict) -> 'ThroughputProfile':
+        return ThroughputProfile(
+            product_id=data['product_id'],
+            firmware=data['firmware'],
+            packet_latency=data['packet_latency'],
+            frame_latency=data['frame_latency'],
+        )
+
+
+class ThroughputStore:
+    """
+    Keeps measured profiles per model and firmware version,
+    optionally persisting them to a JSON file.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.profiles: dict[str, ThroughputProfile] = {}
+
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                for key, data in json.load(f).items():
+                    self.profiles[key] = ThroughputProfile.from_dict(data)
+
+    def _key(product_id: KeyboardId, firmware: int) -> str:
+        return f'{product_id:04x}:{firmware:04x}'
+
+    def get(self, product_id: KeyboardId, firmware: int) -> ThroughputProfile:
+        return self.profiles.get(ThroughputStore._key(product_id, firmware))
+
+    def put(self, profile: ThroughputProfile):
+        key = ThroughputStore._key(profile.product_id, profile.firmware)
+        self.profiles[key] = profile
+
+        if self.path is not None:
+            with open(self.path, 'w') as f:
+                data = {k: p.to_dict() for k, p in self.profiles.items()}
+                json.dump(data, f, indent=2)
+
+
+def probe_throughput(keyboard: Keyboard, frames: int = 20) -> ThroughputProfile:
+    """
+    Measure colormap write latencies by sending `frames` blank colormaps.
+
+    The keyboard's RGB lighting is left in per-key mode, showing no colors.
+    """
+
+    assert frames > 0
+
+    colormap = keyboard.get_default_colormap()
+
+    packet_total = 0.0
+    packet_count = 0
+    frame_total = 0.0
+
+    for _ in range(frames):
+        frame_start = time.perf_counter()
+
+        for msg in keyboard._colormap_messages(colormap):
+            packet_start = time.perf_counter()
+            keyboard._write(msg)
+            packet_total += time.perf_counter() - packet_start
+            packet_count += 1
+
+        frame_total += time.perf_counter() - frame_start
+
+    return ThroughputProfile(
+        product_id=keyboard.device.idProduct,
+        firmware=keyboard.device.bcdDevice,
+        packet_latency=packet_total / packet_count,
+        frame_latency=frame_total / frames,
+    )
+
+
+def get_throughput(
+    keyboard: Keyboard,
+    store: ThroughputStore,
+    frames: int = 20,
+) -> ThroughputProfile:
+    """Get a stored profile for the keyboard, probing it if there is none."""
+
+    profile = store.get(keyboard.device.idProduct, keyboard.device.bcdDevice)
+
+    if profile is None:
+        profile = probe_throughput(keyboard, frames)
+        store.put(profile)
+
+    return profile
+
+
+class FrameRateController:
+    """
+    Adapts the target frame rate to the observed frame write latencies.
+
+    The rate starts at a fraction of the probed maximum, and is then
+    raised additively while writes fit in the frame interval, up to
+    the rate the smoothed latency can sustain, and lowered
+    multiplicatively when they take too much of it.
+    """
+
+    def __init__(
+        self,
+        profile: ThroughputProfile,
+        min_fps: float = 1,
+        max_fps: float = 60,
+        headroom: float = 0.8,
+        step: float = 1,
+        smoothing: float = 0.2,
+    ):
+        assert 0 < min_fps <= max_fps
+        assert 0 < headroom <= 1
+        assert 0 < smoothing <= 1
+
+        self.min_fps = min_fps
+        self.max_fps = max_fps
+        self.headroom = headroom
+        self.step = step
+        self.smoothing = smoothing
+
+        self.latency = profile.frame_latency
+        self.fps = self._clamp(profile.get_max_fps() * headroom)
+
+    def _clamp(self, fps: float) -> float:
+        return min(max(fps, self.min_fps), self.max_fps)
+
+    def get_frame_interval(self) -> float:
+        return 1 / self.fps
+
+    def observe(self, latency: float) -> float:
+        """Account for the write latency of one frame, return the new target."""
+
+        self.latency += self.smoothing * (latency - self.latency)
+
+        budget = self.get_frame_interval() * self.headroom
+
+        if self.latency > budget:
+            self.fps = self._clamp(self.fps * self.headroom)
+        else:
+            sustainable = self.headroom / self.latency \
+                if self.latency > 0 else self.max_fps
+            self.fps = self._clamp(min(self.fps + self.step, sustainable))
+
+        return self.fps
+
+    def apply_colormap(self, keyboard: Keyboard, colormap: Colormap):
+        """Send a colormap, then sleep until the next frame is due."""
+
+        start = time.perf_counter()
+        keyboard.apply_colormap(colormap)
+        latency = time.perf_counter() - start
+
+        self.observe(latency)
+
+        delay = self.get_frame_interval() - latency
+        if delay > 0:
+            time.sleep(delay)